@@ -5,51 +5,105 @@ from sqlalchemy import desc, func, or_
 from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
 from pathlib import Path
+from urllib.parse import quote
 import math
 
 POSTS_PER_PAGE = 10
+# The feed count stops here, so it only walks the newest partitions instead of the whole table
+MAX_FEED_PAGES = 100
+PROJECT_ROOT = Path(__file__).parent.resolve()
+MEDIA_ROOT = PROJECT_ROOT / "media"
+STATIC_MEDIA_DIR = PROJECT_ROOT / "static" / "media"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+CHANNEL_COLOR = "rgb(214, 64, 115)"
+RENDER_CACHE_TTL_SECONDS = 3600
 st.set_page_config(page_title="Telegram · Streamlit", layout="centered", page_icon="data/tg-ico.png")
 st_autorefresh(interval=30 * 1000, key="data_refresher")
 
-def display_media(post):
-    project_root = Path(__file__).parent.resolve()
-    photo_paths = post.photo_paths or []
-    video_paths = post.video_paths or []
-    all_media = photo_paths + video_paths
-
-    if not all_media:
+@st.cache_resource
+def static_media_enabled() -> bool:
+    """
+    Exposes media/ as static/media, so images are served by the static file handler
+    with cache headers instead of being sent again on every rerun
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return False
+    if STATIC_MEDIA_DIR.exists():
+        return True
+    try:
+        STATIC_MEDIA_DIR.parent.mkdir(exist_ok=True)
+        STATIC_MEDIA_DIR.symlink_to(MEDIA_ROOT, target_is_directory=True)
+        return True
+    except OSError:
+        return False
+
+def static_media_url(media_path: Path):
+    try:
+        relative_path = media_path.relative_to(MEDIA_ROOT).as_posix()
+    except ValueError:
+        return None
+    # ?v= makes the static handler send a long max-age, mtime changes it when the file changes
+    return f"app/static/media/{quote(relative_path)}?v={int(media_path.stat().st_mtime)}"
+
+def render_media(post) -> list:
+    static_media = static_media_enabled()
+    media = []
+    for media_path_str in (post.photo_paths or []) + (post.video_paths or []):
+        if not isinstance(media_path_str, str) or not media_path_str.strip(): continue
+        media_path = PROJECT_ROOT / media_path_str
+        if not media_path.exists(): continue
+
+        if media_path_str.lower().endswith(IMAGE_EXTENSIONS):
+            url = static_media_url(media_path) if static_media else None
+            if url:
+                media.append(("html", f"<img src='{url}' loading='lazy' style='width: 100%; border-radius: 0.5rem;'>"))
+            else:
+                media.append(("image", str(media_path)))
+        elif media_path_str.lower().endswith('.mp4'):
+            # static serving sends .mp4 as text/plain, so videos stay on st.video
+            media.append(("video", str(media_path)))
+    return media
+
+@st.cache_data(max_entries=POSTS_PER_PAGE * 50, ttl=RENDER_CACHE_TTL_SECONDS, show_spinner=False)
+def render_post(post_id: int, stats_version: tuple, media_version: tuple, _post) -> dict:
+    """
+    HTML fragments of a post, memoized by (post id, stats version, media paths). _post is not hashed
+    """
+    post = _post
+    header = f"<h5 style='color: {CHANNEL_COLOR}; margin-bottom: -10px;'>{post.channel_name}</h5>"
+
+    text_html = f"<div style='margin-top: 10px;'>{post.post_text}</div>" if post.post_text else ""
+    link_html = f"<a href='{post.link}' target='_blank' style='text-decoration: none; font-size: 1.2em;'>🔗 Ссылка на пост</a>" if post.link else "<span></span>"
+    date_str = post.post_date.strftime('%d.%m.%Y %H:%M:%S')
+    reactions_html = f"&nbsp;&nbsp;<span>❤️ {post.reactions_count}</span>" if post.reactions_count >= 0 else ""
+    stats_html = f"<div style='text-align: right;'><span>🗓️ {date_str}</span>&nbsp;&nbsp;<span>👁️ {post.views or 0}</span>{reactions_html}</div>"
+    footer = f"<hr style='margin: 1em 0;'><div style='display: flex; justify-content: space-between; align-items: center;'>{link_html}{stats_html}</div>"
+
+    return {"header": header, "media": render_media(post), "body": text_html + footer}
+
+def display_media_item(kind: str, value: str):
+    try:
+        if kind == "html":
+            st.markdown(value, unsafe_allow_html=True)
+        elif kind == "image":
+            st.image(value)
+        elif kind == "video":
+            st.video(value)
+    except Exception as e:
+        st.warning(f"Cant display media: {value}. ERROR: {e}")
+
+def display_media(media: list):
+    if not media:
         return
 
-    if len(all_media) == 1:
-        media_path_str = all_media[0]
-        if not isinstance(media_path_str, str) or not media_path_str.strip(): return
-        
-        media_path = project_root / media_path_str
-        if media_path.exists():
-            try:
-                if str(media_path).lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                    st.image(str(media_path))
-                elif str(media_path).lower().endswith('.mp4'):
-                    st.video(str(media_path))
-            except Exception as e:
-                st.warning(f"Cant display media: {media_path_str}. ERROR: {e}")
-    
-    elif len(all_media) > 1:
-        tab_titles = [f"File {i+1}" for i in range(len(all_media))]
+    if len(media) == 1:
+        display_media_item(*media[0])
+    else:
+        tab_titles = [f"File {i+1}" for i in range(len(media))]
         tabs = st.tabs(tab_titles)
-        for i, tab in enumerate(tabs):
+        for tab, item in zip(tabs, media):
             with tab:
-                media_path_str = all_media[i]
-                if not isinstance(media_path_str, str) or not media_path_str.strip(): continue
-                media_path = project_root / media_path_str
-                if media_path.exists():
-                    try:
-                        if str(media_path).lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                            st.image(str(media_path))
-                        elif str(media_path).lower().endswith('.mp4'):
-                            st.video(str(media_path))
-                    except Exception as e:
-                        st.warning(f"Cant display media: {media_path_str}. ERROR: {e}")
+                display_media_item(*item)
 
 
 def display_pagination(total_posts, current_page):
@@ -119,7 +173,8 @@ if st.session_state.search_query:
         )
     )
 
-total_posts = base_query.with_entities(func.count(Post.id)).scalar()
+newest_posts = base_query.with_entities(Post.id).order_by(desc(Post.post_date)).limit(MAX_FEED_PAGES * POSTS_PER_PAGE).subquery()
+total_posts = session.query(func.count()).select_from(newest_posts).scalar()
 offset = (st.session_state.page - 1) * POSTS_PER_PAGE
 posts = base_query.order_by(desc(Post.post_date)).limit(POSTS_PER_PAGE).offset(offset).all()
 
@@ -127,24 +182,12 @@ if not posts:
     st.warning("Cant find posts")
 else:
     for post in posts:
+        media_version = tuple(post.photo_paths or []) + tuple(post.video_paths or [])
+        fragment = render_post(post.id, (post.views, post.reactions_count), media_version, post)
         with st.container(border=True):
-            channel_color = "rgb(214, 64, 115)"
-            st.markdown(f"<h5 style='color: {channel_color}; margin-bottom: -10px;'>{post.channel_name}</h5>", unsafe_allow_html=True)
-            
-            display_media(post)
-
-            if post.post_text:
-                st.markdown(f"<div style='margin-top: 10px;'>{post.post_text}</div>", unsafe_allow_html=True)
-            
-            st.markdown("---")
-            footer_cols = st.columns(2)
-            with footer_cols[0]:
-                if post.link:
-                    st.markdown(f"<a href='{post.link}' target='_blank' style='text-decoration: none; font-size: 1.2em;'>🔗 Ссылка на пост</a>", unsafe_allow_html=True)
-            with footer_cols[1]:
-                date_str = post.post_date.strftime('%d.%m.%Y %H:%M:%S')
-                reactions_html = f"&nbsp;&nbsp;<span>❤️ {post.reactions_count}</span>" if post.reactions_count >= 0 else ""
-                st.markdown(f"<div style='text-align: right;'><span>🗓️ {date_str}</span>&nbsp;&nbsp;<span>👁️ {post.views or 0}</span>{reactions_html}</div>", unsafe_allow_html=True)
+            st.markdown(fragment["header"], unsafe_allow_html=True)
+            display_media(fragment["media"])
+            st.markdown(fragment["body"], unsafe_allow_html=True)
 
 display_pagination(total_posts, st.session_state.page)
 session.close()
\ No newline at end of file
@@ -4,7 +4,7 @@ from datetime import datetime, timezone, timedelta
 from telethon import TelegramClient, events
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import desc
-from src import config, db, telegram
+from src import config, db, dedup, partitions, telegram
 from src.models import Post, SyncedChannel
 
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s/%(asctime)s] %(name)s: %(message)s")
@@ -18,23 +18,34 @@ SMART_UPDATE_INTERVAL_SECONDS = 300
 HOT_POST_AGE_HOURS = 2
 WARM_POST_AGE_DAYS = 2
 UPDATE_BATCH_SIZE = 25
+UNIQUE_VIOLATION = '23505'
+
+SEEN_MESSAGES = dedup.SeenMessages(config.SEEN_CACHE_PER_CHANNEL)
+
+def already_saved(messages: list) -> bool:
+    main_message = telegram.get_main_message(messages)
+    return (main_message.chat.id, main_message.id) in SEEN_MESSAGES
 
 async def save_post(message_data: dict):
+    if partitions.is_expired(message_data['post_date']):
+        return
     session = db.get_session()
     if not session:
         logger.error("No db session while connecting...")
         return
     try:
-        exists = session.query(Post.id).filter_by(channel_id=message_data['channel_id'], message_id=message_data['message_id']).first()
-        if exists:
-            return
-            
+        partitions.ensure_partition(message_data['post_date'])
         post_obj = Post(**message_data)
         session.add(post_obj)
         session.commit()
+        SEEN_MESSAGES.add(message_data['channel_id'], message_data['message_id'])
         logger.info(f"Saved post [ID: {message_data['message_id']}] channel «{message_data['channel_name']}»")
-    except IntegrityError:
+    except IntegrityError as e:
         session.rollback()
+        if getattr(e.orig, 'pgcode', None) == UNIQUE_VIOLATION:
+            SEEN_MESSAGES.add(message_data['channel_id'], message_data['message_id'])
+        else:
+            logger.error(f"ERROR saving post [ID: {message_data['message_id']}] channel «{message_data['channel_name']}»: {e.orig}")
     except Exception as e:
         logger.error(f"ERROR saving: {e}")
         session.rollback()
@@ -46,6 +57,7 @@ async def process_grouped_message(grouped_id, client):
         group_info = GROUPED_MESSAGE_BUFFER.pop(grouped_id, None)
         if not group_info: return
         messages = group_info['messages']
+        if already_saved(messages): return
         logger.info(f"Albom {grouped_id} with {len(messages)} parts")
         post_data = await telegram.parse_grouped_message_data(messages)
         await save_post(post_data)
@@ -63,6 +75,7 @@ async def realtime_event_handler(event):
         timer = loop.call_later(DEBOUNCE_DELAY, lambda: asyncio.create_task(process_grouped_message(grouped_id, event.client)))
         GROUPED_MESSAGE_BUFFER[grouped_id]['timer'] = timer
     else:
+        if already_saved([message]): return
         logger.info(f"New message «{event.chat.title}»")
         post_data = await telegram.parse_grouped_message_data([message])
         await save_post(post_data)
@@ -77,8 +90,9 @@ async def historical_sync(client: TelegramClient, channel: str):
         start_date = datetime(2025, 1, 1, tzinfo=timezone.utc)
         entity = await client.get_entity(channel)
         async for message in client.iter_messages(entity, limit=None):
-            if message.date < start_date: break
+            if message.date < start_date or partitions.is_expired(message.date): break
             if message.grouped_id: continue
+            if already_saved([message]): continue
             post_data = await telegram.parse_grouped_message_data([message])
             await save_post(post_data)
             await asyncio.sleep(config.SAFE_DELAY_SECONDS)
@@ -186,6 +200,7 @@ async def main():
         return
     
     synced_ids = {c.channel_id for c in session.query(SyncedChannel).all()}
+    SEEN_MESSAGES.warm(session, datetime.now(timezone.utc) - timedelta(days=config.SEEN_CACHE_WARM_DAYS))
     session.close()
     
     tasks_to_run = []
@@ -40,5 +40,15 @@ SOURCE_CHANNELS = [
 ]
 
 SAFE_DELAY_SECONDS = 1.5
+# Recent message ids kept in memory per channel to skip duplicates before downloading media
+SEEN_CACHE_PER_CHANNEL = int(os.getenv("SEEN_CACHE_PER_CHANNEL", "10000"))
+SEEN_CACHE_WARM_DAYS = int(os.getenv("SEEN_CACHE_WARM_DAYS", "30"))
 MEDIA_DIR = Path("media")
-MEDIA_DIR.mkdir(exist_ok=True)
\ No newline at end of file
+MEDIA_DIR.mkdir(exist_ok=True)
+
+# Monthly partitions of the posts table: how many future months to pre-create
+# and how many months to keep attached (0 disables retention).
+PARTITIONS_AHEAD_MONTHS = int(os.getenv("PARTITIONS_AHEAD_MONTHS", "2"))
+POSTS_RETENTION_MONTHS = int(os.getenv("POSTS_RETENTION_MONTHS", "0"))
+POSTS_RETENTION_MODE = os.getenv("POSTS_RETENTION_MODE", "archive")  # archive | detach
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive"))
@@ -0,0 +1,54 @@
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import desc, func
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+class SeenMessages:
+    """
+    Bounded per-channel LRU of already saved message ids. A hit means the post is
+    in the db for sure; a miss means "unknown", the unique constraint stays the final guard
+    """
+    def __init__(self, max_per_channel: int):
+        self.max_per_channel = max_per_channel
+        self._channels = {}
+
+    def __contains__(self, key) -> bool:
+        channel_id, message_id = key
+        seen = self._channels.get(channel_id)
+        if seen is None or message_id not in seen:
+            return False
+        seen.move_to_end(message_id)
+        return True
+
+    def add(self, channel_id: int, message_id: int):
+        seen = self._channels.setdefault(channel_id, OrderedDict())
+        seen[message_id] = None
+        seen.move_to_end(message_id)
+        if len(seen) > self.max_per_channel:
+            seen.popitem(last=False)
+
+    def warm(self, session, since: datetime) -> int:
+        """
+        Loads the newest max_per_channel message ids of every channel posted after since.
+        The post_date bound keeps the startup query on the recent partitions only
+        """
+        ranked = session.query(
+            Post.channel_id, Post.message_id,
+            func.row_number().over(partition_by=Post.channel_id, order_by=desc(Post.post_date)).label("rank"),
+        ).filter(Post.post_date >= since).subquery()
+        rows = (
+            session.query(ranked.c.channel_id, ranked.c.message_id)
+            .filter(ranked.c.rank <= self.max_per_channel)
+            .order_by(ranked.c.channel_id, desc(ranked.c.rank))
+        )
+        count = 0
+        for channel_id, message_id in rows:
+            self.add(channel_id, message_id)
+            count += 1
+        logger.info(f"Seen cache warmed with {count} posts from {len(self._channels)} channels")
+        return count
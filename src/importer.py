@@ -5,7 +5,7 @@ import logging
 from telethon import TelegramClient
 from sqlalchemy.exc import IntegrityError
 
-from . import config, telegram
+from . import config, partitions, telegram
 from .db import get_session, get_latest_post_id
 from .models import Post
 
@@ -44,11 +44,14 @@ async def main(channel_username: str):
                 
                 if not message.id or (not message.text and not message.media):
                     continue
+                if partitions.is_expired(message.date):
+                    break
 
                 post_data = await telegram.parse_message_data(message)
                 
                 new_post = Post(**post_data)
-                
+                partitions.ensure_partition(new_post.post_date)
+
                 try:
                     session.add(new_post)
                     session.commit()
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import DateTime, tuple_
+
+from . import db
+from .models import MigrationCheckpoint
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+MOVE_WORKERS = 8
+JOURNAL_DIR = Path("migration_journals")
+
+def _dump_key(values) -> list:
+    return [v.isoformat() if isinstance(v, datetime) else v for v in values]
+
+def _load_key(key_columns, values) -> list:
+    return [
+        datetime.fromisoformat(v) if isinstance(column.type, DateTime) and v is not None else v
+        for column, v in zip(key_columns, values)
+    ]
+
+def row_key(row, key_columns) -> list:
+    return [getattr(row, column.key) for column in key_columns]
+
+def ensure_checkpoint_table():
+    MigrationCheckpoint.__table__.create(bind=db.engine, checkfirst=True)
+
+def load_checkpoint(session, name: str):
+    return session.query(MigrationCheckpoint).filter_by(name=name).first()
+
+def save_checkpoint(session, name: str, key: list, processed: int):
+    """
+    Stores progress in the current transaction, so it is committed together with the chunk
+    """
+    checkpoint = load_checkpoint(session, name)
+    if not checkpoint:
+        checkpoint = MigrationCheckpoint(name=name)
+        session.add(checkpoint)
+    checkpoint.last_key = _dump_key(key)
+    checkpoint.processed = processed
+
+def reset_checkpoint(session, name: str):
+    ensure_checkpoint_table()
+    session.query(MigrationCheckpoint).filter_by(name=name).delete(synchronize_session=False)
+    session.commit()
+
+class Progress:
+    def __init__(self, name: str, processed: int = 0):
+        self.name = name
+        self.started = time.monotonic()
+        self.processed = processed
+        self.rows = 0
+        self.files = 0
+        self.chunks = 0
+
+    def update(self, rows: int, files: int = 0):
+        self.chunks += 1
+        self.rows += rows
+        self.processed += rows
+        self.files += files
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        logger.info(
+            f"[{self.name}] chunk {self.chunks}: {self.processed} rows total, "
+            f"{self.rows / elapsed:.1f} rows/s, {self.files} files moved ({self.files / elapsed:.1f} files/s)"
+        )
+
+class MoveJournal:
+    """
+    Append-only log of planned file moves (one JSON line per move), written before
+    the move itself, so an interrupted run can always be rolled back
+    """
+    def __init__(self, name: str, journal_dir: Path = JOURNAL_DIR):
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        self.path = journal_dir / f"{name}.jsonl"
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def record(self, src: Path, dst: Path):
+        with self._lock:
+            if not self._fh:
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(json.dumps({"src": str(src), "dst": str(dst)}) + "\n")
+            self._fh.flush()
+
+    def sync(self):
+        with self._lock:
+            if self._fh:
+                os.fsync(self._fh.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._fh:
+                self._fh.close()
+                self._fh = None
+
+    def entries(self) -> list:
+        if not self.path.exists():
+            return []
+        with open(self.path, encoding="utf-8") as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+
+    def discard(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def rollback(self, dry_run: bool = False) -> list:
+        """
+        Moves journaled files back, newest first. Returns restored entries.
+        The journal is kept, discard() it once the db side is rolled back too
+        """
+        self.close()
+        restored = []
+        for entry in reversed(self.entries()):
+            src, dst = Path(entry["src"]), Path(entry["dst"])
+            if not dst.exists() or src.exists():
+                continue
+            if dry_run:
+                logger.info(f"[DRY RUN] Would restore {dst} -> {src}")
+            else:
+                src.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(dst), str(src))
+            restored.append(entry)
+        return restored
+
+def move_files(moves: list, journal: MoveJournal, dry_run: bool = False, workers: int = MOVE_WORKERS) -> tuple:
+    """
+    Moves (src, dst) pairs in a thread pool. Missing sources and existing targets are skipped.
+    Each source is moved once; pairs sharing a source are done if that file ended up at their dst
+    or is gone with nothing to move. Returns (moved_count, failed_pairs)
+    """
+    def move_one(pair):
+        src, dst = pair
+        if dst.exists() or not src.exists():
+            return "skipped"
+        if dry_run:
+            logger.info(f"[DRY RUN] Would move {src} -> {dst}")
+            return "moved"
+        try:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            journal.record(src, dst)
+            shutil.move(str(src), str(dst))
+            return "moved"
+        except Exception as e:
+            if dst.exists() and not src.exists():
+                return "skipped"
+            logger.warning(f"Cant move {src}: {e}")
+            return "failed"
+
+    if not moves:
+        return 0, set()
+    unique_moves = list({src: (src, dst) for src, dst in reversed(moves)}.values())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        statuses = dict(zip(unique_moves, pool.map(move_one, unique_moves)))
+    if not dry_run:
+        journal.sync()
+    failed_sources = {src for (src, _), status in statuses.items() if status == "failed"}
+    failed = {pair for pair in moves if pair[0] in failed_sources}
+    return list(statuses.values()).count("moved"), failed
+
+def run_chunked(name: str, query_factory, key_columns: list, process_chunk,
+                chunk_size: int = CHUNK_SIZE, dry_run: bool = False):
+    """
+    Streams rows from query_factory(session) in keyset order on key_columns and calls
+    process_chunk(session, rows, is_last) for each chunk. Every chunk is committed together
+    with its checkpoint, so an interrupted run resumes after the last committed chunk.
+
+    process_chunk returns (last_done_row, files_moved); rows after last_done_row are
+    read again with the next chunk (None means the whole chunk is done). In dry-run mode
+    nothing is committed
+    """
+    session = db.get_session()
+    if not session:
+        logger.error("No db connection...")
+        return
+    ensure_checkpoint_table()
+
+    try:
+        checkpoint = load_checkpoint(session, name)
+        after = _load_key(key_columns, checkpoint.last_key) if checkpoint and checkpoint.last_key else None
+        progress = Progress(name, checkpoint.processed if checkpoint else 0)
+        if after:
+            logger.info(f"[{name}] resuming after {checkpoint.last_key} ({progress.processed} rows done)")
+
+        while True:
+            query = query_factory(session)
+            if after:
+                query = query.filter(tuple_(*key_columns) > tuple_(*after))
+            rows = query.order_by(*key_columns).limit(chunk_size).all()
+            if not rows:
+                break
+            is_last = len(rows) < chunk_size
+
+            last_done, files_moved = process_chunk(session, rows, is_last)
+            if last_done is None:
+                last_done = rows[-1]
+            done_rows = rows.index(last_done) + 1
+            after = row_key(last_done, key_columns)
+
+            if dry_run:
+                session.rollback()
+            else:
+                save_checkpoint(session, name, after, progress.processed + done_rows)
+                session.commit()
+            session.expunge_all()
+            progress.update(done_rows, files_moved)
+            if is_last:
+                break
+
+        logger.info(f"[{name}] finished: {progress.processed} rows, {progress.files} files moved")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
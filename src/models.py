@@ -1,18 +1,20 @@
 from sqlalchemy import (Column, Integer, String, DateTime, BigInteger,
-                        JSON, UniqueConstraint)
+                        JSON, UniqueConstraint, Index, func)
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
 class Post(Base):
     __tablename__ = 'posts'
-    id = Column(Integer, primary_key=True, index=True)
+    # posts is range-partitioned by month on post_date (see src/partitions.py),
+    # so the partition key has to be part of every primary/unique key.
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     message_id = Column(Integer, nullable=False)
     grouped_id = Column(BigInteger, index=True)
     channel_id = Column(BigInteger, nullable=False)
     channel_name = Column(String(255))
     post_text = Column(String)
-    post_date = Column(DateTime(timezone=True), nullable=False)
+    post_date = Column(DateTime(timezone=True), primary_key=True, nullable=False)
     views = Column(Integer)
     reactions_count = Column(Integer, default=0)
     link = Column(String(255))
@@ -21,9 +23,22 @@ class Post(Base):
     video_path = Column(String(255))
     photo_paths = Column(JSON)
     video_paths = Column(JSON)
-    __table_args__ = (UniqueConstraint('channel_id', 'message_id', name='_channel_message_uc'),)
+    __table_args__ = (
+        UniqueConstraint('channel_id', 'message_id', 'post_date', name='_channel_message_uc'),
+        Index('ix_posts_post_date_desc', post_date.desc()),
+        Index('ix_posts_channel_id_post_date', channel_id, post_date),
+        {'postgresql_partition_by': 'RANGE (post_date)'},
+    )
 
 class SyncedChannel(Base):
     __tablename__ = 'synced_channels'
     id = Column(Integer, primary_key=True)
-    channel_id = Column(BigInteger, unique=True, nullable=False)
\ No newline at end of file
+    channel_id = Column(BigInteger, unique=True, nullable=False)
+
+class MigrationCheckpoint(Base):
+    __tablename__ = 'migration_checkpoints'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)
+    last_key = Column(JSON)
+    processed = Column(BigInteger, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
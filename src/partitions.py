@@ -0,0 +1,186 @@
+import gzip
+import logging
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+
+from . import config, db
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "posts"
+PARTITION_NAME_RE = re.compile(r"^posts_y(\d{4})m(\d{2})$")
+DETACHED_SUFFIX = "_detached"
+
+_known_partitions = set()
+_parent_partitioned = None
+
+def month_start(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    dt = dt.astimezone(timezone.utc)
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+def add_months(dt: datetime, months: int) -> datetime:
+    index = dt.year * 12 + dt.month - 1 + months
+    return dt.replace(year=index // 12, month=index % 12 + 1)
+
+def partition_name(dt: datetime) -> str:
+    start = month_start(dt)
+    return f"posts_y{start.year}m{start.month:02d}"
+
+def partition_month(name: str):
+    match = PARTITION_NAME_RE.match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+def relkind(conn, table: str):
+    """
+    'p' for a partitioned table, 'r' for a plain one, None if it doesnt exist
+    """
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": table}
+    ).scalar()
+
+def is_partitioned() -> bool:
+    """
+    Checked once per process: posts stays a plain table until tables/partition_posts.py
+    has run, restart the collector after the migration
+    """
+    global _parent_partitioned
+    if _parent_partitioned is None and db.engine:
+        with db.engine.connect() as conn:
+            _parent_partitioned = relkind(conn, PARENT_TABLE) == "p"
+    return bool(_parent_partitioned)
+
+def retention_cutoff(now: datetime = None):
+    """
+    Start of the oldest month kept attached, None when retention is disabled
+    """
+    if config.POSTS_RETENTION_MONTHS <= 0:
+        return None
+    return add_months(month_start(now or datetime.now(timezone.utc)), -config.POSTS_RETENTION_MONTHS)
+
+def is_expired(dt: datetime) -> bool:
+    cutoff = retention_cutoff()
+    return cutoff is not None and month_start(dt) < cutoff
+
+def create_partition(conn, dt: datetime, parent: str = PARENT_TABLE) -> str:
+    """
+    Creates the monthly partition for dt on parent (no-op if it exists). Returns its name
+    """
+    name = partition_name(dt)
+    start = month_start(dt)
+    end = add_months(start, 1)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return name
+
+def ensure_partition(dt: datetime):
+    """
+    Makes sure the partition for dt exists before inserting into posts.
+    Runs in its own transaction, so a rolled back insert never drops the partition.
+    Returns the partition name, None if posts isnt partitioned or creation failed
+    """
+    name = partition_name(dt)
+    if name in _known_partitions:
+        return name
+    if not is_partitioned():
+        return None
+    try:
+        with db.engine.begin() as conn:
+            create_partition(conn, dt)
+        _known_partitions.add(name)
+        return name
+    except Exception as e:
+        logger.warning(f"Cant create partition {name}: {e}")
+        return None
+
+def ensure_partitions_ahead(months_ahead: int, since: datetime = None) -> list:
+    """
+    Pre-creates partitions from since (default: current month) up to months_ahead.
+    Returns names of the partitions that exist now
+    """
+    start = month_start(since or datetime.now(timezone.utc))
+    end = add_months(month_start(datetime.now(timezone.utc)), months_ahead)
+    created = []
+    month = start
+    while month <= end:
+        name = ensure_partition(month)
+        if name:
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+def list_partitions(conn, parent: str = PARENT_TABLE) -> list:
+    """
+    Returns (name, month) for attached monthly partitions of parent, oldest first
+    """
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": parent}).scalars().all()
+    partitions = [(name, partition_month(name)) for name in rows]
+    return sorted((p for p in partitions if p[1]), key=lambda p: p[1])
+
+def expired_partitions(conn, now: datetime = None) -> list:
+    """
+    Partitions whose whole month is older than the retention cutoff
+    """
+    cutoff = retention_cutoff(now)
+    if cutoff is None:
+        return []
+    return [name for name, month in list_partitions(conn) if month < cutoff]
+
+def detach_partition(name: str, parent: str = PARENT_TABLE) -> str:
+    """
+    Detaches partition and renames it to <name>_detached, so the month name is free again
+    """
+    detached_name = f"{name}{DETACHED_SUFFIX}"
+    with db.engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {name}"))
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO {detached_name}"))
+    _known_partitions.discard(name)
+    logger.info(f"Detached partition {name} -> {detached_name}")
+    return detached_name
+
+def export_partition(name: str, archive_path: Path):
+    """
+    Dumps table to a gzipped csv. Writes to a temp file first, so a failed export
+    never leaves a partial archive behind
+    """
+    tmp_path = archive_path.with_suffix(".gz.part")
+    raw_conn = db.engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cursor, gzip.open(tmp_path, "wb") as fh:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", fh)
+        raw_conn.commit()
+        tmp_path.replace(archive_path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        raw_conn.close()
+
+def archive_partition(name: str, archive_dir: Path, parent: str = PARENT_TABLE) -> Path:
+    """
+    Dumps partition to <archive_dir>/<name>.csv.gz, then detaches and drops it.
+    The partition stays attached if the export fails
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = archive_dir / f"{name}.csv.gz"
+
+    export_partition(name, archive_path)
+
+    with db.engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+    _known_partitions.discard(name)
+    logger.info(f"Archived partition {name} -> {archive_path}")
+    return archive_path
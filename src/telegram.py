@@ -22,8 +22,11 @@ async def download_media_if_needed(message, channel_id: int) -> tuple:
         logger.error("Download ERROR %d: %s", message.id, e)
     return photo_path, video_path
 
+def get_main_message(messages: list):
+    return next((m for m in messages if m.text), messages[0])
+
 async def parse_grouped_message_data(messages: list) -> dict:
-    main_message = next((m for m in messages if m.text), messages[0])
+    main_message = get_main_message(messages)
     all_photo_paths, all_video_paths = [], []
     for msg in messages:
         photo_path, video_path = await download_media_if_needed(msg, msg.chat.id)
@@ -1,74 +1,125 @@
-import os
-import shutil
+import argparse
 import logging
 import sys
 from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
-from src import db
+from sqlalchemy import or_
+from src import db, migration
 from src.models import Post
 
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 
-def main():
-    logging.info("Starting optimizing media...")
-    session = db.get_session()
-    if not session:
-        logging.error("No db connection...")
-        return
+MIGRATION_NAME = "consolidate_media"
+MEDIA_FIELDS = [("photo_path", "photo_paths"), ("video_path", "video_paths")]
 
-    all_posts = session.query(Post).all()
-    logging.info(f"Found {len(all_posts)} posts to check path")
+def new_media_path(post, old_path: Path) -> Path:
+    return Path("media") / str(post.channel_id) / old_path.name
 
-    updated_count = 0
-    for post in all_posts:
-        needs_update = False
-        if post.photo_path and not post.photo_paths:
-            old_path = Path(post.photo_path)
-            new_dir = Path("media") / str(post.channel_id)
-            new_path = new_dir / old_path.name
-            
-            if old_path.exists() and not new_path.exists():
-                new_dir.mkdir(parents=True, exist_ok=True)
-                try:
-                    shutil.move(str(old_path), str(new_path))
-                    logging.info(f"Moved file: {old_path} -> {new_path}")
-                except Exception as e:
-                    logging.warning(f"Cant move {old_path}: {e}")
-                    continue
-            
-            post.photo_paths = [str(new_path).replace('\\', '/')]
-            needs_update = True
+def needs_consolidation(post, old_field: str, new_field: str) -> bool:
+    return bool(getattr(post, old_field)) and not getattr(post, new_field)
+
+def legacy_posts_query(session):
+    return session.query(Post).filter(or_(Post.photo_path.isnot(None), Post.video_path.isnot(None)))
 
-        if post.video_path and not post.video_paths:
-            old_path = Path(post.video_path)
-            new_dir = Path("media") / str(post.channel_id)
-            new_path = new_dir / old_path.name
+def make_chunk_processor(journal, dry_run: bool, workers: int, totals: dict):
+    def process_chunk(session, posts, is_last):
+        moves = []
+        for post in posts:
+            for old_field, new_field in MEDIA_FIELDS:
+                if needs_consolidation(post, old_field, new_field):
+                    old_path = Path(getattr(post, old_field))
+                    moves.append((old_path, new_media_path(post, old_path)))
 
-            if old_path.exists() and not new_path.exists():
-                new_dir.mkdir(parents=True, exist_ok=True)
-                try:
-                    shutil.move(str(old_path), str(new_path))
-                    logging.info(f"Moved file: {old_path} -> {new_path}")
-                except Exception as e:
-                    logging.warning(f"Cant move {old_path}: {e}")
+        moved_count, failed = migration.move_files(moves, journal, dry_run=dry_run, workers=workers)
+
+        for post in posts:
+            needs_update = False
+            for old_field, new_field in MEDIA_FIELDS:
+                if not needs_consolidation(post, old_field, new_field):
                     continue
+                old_path = Path(getattr(post, old_field))
+                new_path = new_media_path(post, old_path)
+                if (old_path, new_path) in failed:
+                    totals["failed"].append(post.id)
+                    break
+                setattr(post, new_field, [str(new_path).replace('\\', '/')])
+                needs_update = True
+            if needs_update:
+                totals["updated"] += 1
+        return None, moved_count
+    return process_chunk
 
-            post.video_paths = [str(new_path).replace('\\', '/')]
-            needs_update = True
+def rollback(dry_run: bool):
+    journal = migration.MoveJournal(MIGRATION_NAME)
+    restored = journal.rollback(dry_run=dry_run)
+    logging.info(f"Restored {len(restored)} files from journal")
 
-        if needs_update:
-            updated_count += 1
+    session = db.get_session()
+    if not session:
+        logging.error(f"No db connection, *_paths not cleared. Journal kept: {journal.path}")
+        return
+    try:
+        sources = [entry["src"] for entry in restored]
+        for i in range(0, len(sources), migration.CHUNK_SIZE):
+            batch = sources[i:i + migration.CHUNK_SIZE]
+            for old_field, new_field in MEDIA_FIELDS:
+                session.query(Post).filter(getattr(Post, old_field).in_(batch)).update(
+                    {new_field: None}, synchronize_session=False
+                )
+        if dry_run:
+            session.rollback()
+        else:
+            session.commit()
+            # The journal is the only link between moved files and posts, keep it until the db is updated
+            journal.discard()
+            migration.reset_checkpoint(session, MIGRATION_NAME)
+    except Exception as e:
+        session.rollback()
+        logging.error(f"Cant clear *_paths: {e}. Journal kept: {journal.path}")
+        raise
+    finally:
+        session.close()
+
+def main(chunk_size: int, workers: int, dry_run: bool, reset: bool):
+    logging.info("Starting optimizing media...")
+    if reset:
+        session = db.get_session()
+        if session:
+            migration.reset_checkpoint(session, MIGRATION_NAME)
+            session.close()
 
-    if updated_count > 0:
-        logging.info(f"Saving {updated_count} posts in db...")
-        session.commit()
-        logging.info("Finished uupdating...")
+    journal = migration.MoveJournal(MIGRATION_NAME)
+    totals = {"updated": 0, "failed": []}
+    try:
+        migration.run_chunked(
+            MIGRATION_NAME, legacy_posts_query, [Post.id],
+            make_chunk_processor(journal, dry_run, workers, totals),
+            chunk_size=chunk_size, dry_run=dry_run,
+        )
+    finally:
+        journal.close()
+
+    if totals["updated"] > 0:
+        logging.info(f"Updated {totals['updated']} posts in db")
     else:
         logging.info("No posts to optimize")
-
-    session.close()
+    if totals["failed"]:
+        logging.warning(
+            f"Cant move files of {len(totals['failed'])} posts (IDs: {totals['failed']}), "
+            f"they are past the checkpoint: fix the cause and rerun with --reset"
+        )
     logging.info("Finished optimizing...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Move legacy media files into media/<channel_id>/ and fill *_paths")
+    parser.add_argument("--chunk-size", type=int, default=migration.CHUNK_SIZE, help="Posts per transaction")
+    parser.add_argument("--workers", type=int, default=migration.MOVE_WORKERS, help="Parallel file moves")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would be moved, change nothing")
+    parser.add_argument("--reset", action="store_true", help="Forget the checkpoint and start from the first post")
+    parser.add_argument("--rollback", action="store_true", help="Move journaled files back and clear *_paths")
+    args = parser.parse_args()
+    if args.rollback:
+        rollback(args.dry_run)
+    else:
+        main(args.chunk_size, args.workers, args.dry_run, args.reset)
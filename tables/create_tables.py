@@ -3,6 +3,7 @@ import sys
 from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
+from src import config, partitions
 from src.db import engine, Base
 
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
@@ -12,6 +13,11 @@ def main():
     logger.info("Connecting db...")
     try:
         Base.metadata.create_all(bind=engine)
+        if partitions.is_partitioned():
+            created = partitions.ensure_partitions_ahead(config.PARTITIONS_AHEAD_MONTHS)
+            logger.info(f"Partitions ready: {', '.join(created)}")
+        else:
+            logger.warning("Table posts is not partitioned, run tables/partition_posts.py to migrate it")
         logger.info("FINISHED CREATE TABLES...")
     except Exception as e:
         logger.critical(f"ERROR: {e}")
@@ -1,76 +1,98 @@
+import argparse
 import logging
 from datetime import timedelta
-from sqlalchemy import desc
+from itertools import groupby
 import sys
 from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
-from src import db
+from src import db, migration
 from src.models import Post
-from collections import defaultdict
 
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 
-def main():
-    logging.info("Merge alboms...")
-    session = db.get_session()
-    if not session:
-        logging.error("No db connection...")
-        return
+MIGRATION_NAME = "migrate_media"
+ALBUM_WINDOW = timedelta(seconds=3)
 
-    posts_by_channel = defaultdict(list)
-    all_posts = session.query(Post).order_by(Post.post_date).all()
-    for post in all_posts:
-        posts_by_channel[post.channel_id].append(post)
+def iter_album_groups(posts: list):
+    """
+    Yields (start, end, main_post, album_group) for posts of one channel sorted by post_date
+    """
+    i = 0
+    while i < len(posts):
+        current_post = posts[i]
+        album_group = [current_post]
 
-    posts_to_delete_ids = []
-    main_posts_to_update = []
+        j = i + 1
+        while j < len(posts) and (posts[j].post_date - current_post.post_date) < ALBUM_WINDOW:
+            if posts[j].post_text and not current_post.post_text:
+                album_group.append(current_post)
+                current_post = posts[j]
+            else:
+                album_group.append(posts[j])
+            j += 1
+
+        yield i, j, current_post, album_group
+        i = j
 
-    logging.info("Analyze dublicate alboms...")
-    for channel_id, posts in posts_by_channel.items():
-        i = 0
-        while i < len(posts):
-            current_post = posts[i]
-            album_group = [current_post]
-            
-            j = i + 1
-            while j < len(posts) and (posts[j].post_date - current_post.post_date) < timedelta(seconds=3):
-                if posts[j].post_text and not current_post.post_text:
-                    album_group.append(current_post)
-                    current_post = posts[j]
-                else:
-                    album_group.append(posts[j])
-                j += 1
-            
-            if len(album_group) > 1:
-                logging.info(f"Group {len(album_group)} posts from channel_id {channel_id} (post ID: {current_post.id})")
-                
-                all_photos = []
-                all_videos = []
-                
-                for p in album_group:
-                    if p.photo_paths: all_photos.extend(p.photo_paths)
-                    if p.video_paths: all_videos.extend(p.video_paths)
-                    if p.id != current_post.id:
-                        posts_to_delete_ids.append(p.id)
-                
-                current_post.photo_paths = list(set(all_photos))
-                current_post.video_paths = list(set(all_videos))
-                main_posts_to_update.append(current_post)
+def merge_album(session, channel_id, current_post, album_group) -> int:
+    logging.info(f"Group {len(album_group)} posts from channel_id {channel_id} (post ID: {current_post.id})")
+
+    all_photos = []
+    all_videos = []
+    posts_to_delete_ids = []
 
-            i = j
+    for p in album_group:
+        if p.photo_paths: all_photos.extend(p.photo_paths)
+        if p.video_paths: all_videos.extend(p.video_paths)
+        if p.id != current_post.id:
+            posts_to_delete_ids.append(p.id)
 
-    if main_posts_to_update:
-        logging.info(f"Updating {len(main_posts_to_update)} posts...")
-        session.commit()
-    
+    current_post.photo_paths = list(set(all_photos))
+    current_post.video_paths = list(set(all_videos))
+    session.flush()
     if posts_to_delete_ids:
-        logging.info(f"Deleting {len(posts_to_delete_ids)} dublicates...")
         session.query(Post).filter(Post.id.in_(posts_to_delete_ids)).delete(synchronize_session=False)
-        session.commit()
+    return len(posts_to_delete_ids)
+
+def make_chunk_processor(totals: dict):
+    def process_chunk(session, posts, is_last):
+        segments = [list(group) for _, group in groupby(posts, key=lambda p: p.channel_id)]
+        for seg_index, channel_posts in enumerate(segments):
+            for start, end, current_post, album_group in iter_album_groups(channel_posts):
+                album_may_continue = not is_last and seg_index == len(segments) - 1 and end == len(channel_posts)
+                if album_may_continue and (start > 0 or seg_index > 0):
+                    # Re-read the trailing album with the next chunk
+                    return (channel_posts[start - 1] if start > 0 else segments[seg_index - 1][-1]), 0
+
+                if len(album_group) > 1:
+                    totals["deleted"] += merge_album(session, current_post.channel_id, current_post, album_group)
+                    totals["merged"] += 1
+        return None, 0
+    return process_chunk
+
+def main(chunk_size: int, dry_run: bool, reset: bool):
+    logging.info("Merge alboms...")
+    if reset:
+        session = db.get_session()
+        if session:
+            migration.reset_checkpoint(session, MIGRATION_NAME)
+            session.close()
+
+    totals = {"merged": 0, "deleted": 0}
+    migration.run_chunked(
+        MIGRATION_NAME, lambda session: session.query(Post),
+        [Post.channel_id, Post.post_date, Post.id], make_chunk_processor(totals),
+        chunk_size=chunk_size, dry_run=dry_run,
+    )
 
+    logging.info(f"Merged {totals['merged']} alboms, deleted {totals['deleted']} dublicates")
     logging.info("Finishing...")
-    session.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Merge album posts that were saved as separate posts")
+    parser.add_argument("--chunk-size", type=int, default=migration.CHUNK_SIZE, help="Posts per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only show albums to merge, change nothing")
+    parser.add_argument("--reset", action="store_true", help="Forget the checkpoint and start from the first post")
+    args = parser.parse_args()
+    main(args.chunk_size, args.dry_run, args.reset)
@@ -0,0 +1,47 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+from src import config, db, partitions
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+def main(dry_run: bool):
+    if not db.engine:
+        logger.error("No db connection...")
+        return
+
+    if not partitions.is_partitioned():
+        logger.error("Table posts is not partitioned, run tables/partition_posts.py first")
+        return
+
+    created = partitions.ensure_partitions_ahead(config.PARTITIONS_AHEAD_MONTHS)
+    logger.info(f"Partitions ready: {', '.join(created)}")
+
+    with db.engine.connect() as conn:
+        expired = partitions.expired_partitions(conn)
+    if not expired:
+        logger.info("No partitions out of retention")
+        return
+
+    mode = config.POSTS_RETENTION_MODE
+    for name in expired:
+        if dry_run:
+            logger.info(f"[DRY RUN] Would {mode} partition {name}")
+            continue
+        try:
+            if mode == "detach":
+                partitions.detach_partition(name)
+            else:
+                partitions.archive_partition(name, config.ARCHIVE_DIR)
+        except Exception as e:
+            logger.error(f"Cant {mode} partition {name}: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create upcoming posts partitions and apply retention policy")
+    parser.add_argument("--dry-run", action="store_true", help="Only show partitions out of retention")
+    args = parser.parse_args()
+    main(args.dry_run)
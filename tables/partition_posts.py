@@ -0,0 +1,167 @@
+import argparse
+import logging
+import sys
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+from sqlalchemy import text
+from src import config, db, partitions
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+NEW_TABLE = "posts_partitioned"
+LEGACY_TABLE = "posts_legacy"
+BATCH_SIZE = 5000
+# Rows this fresh may still get views/reactions updates while copying, re-synced at swap
+STATS_SYNC_DAYS = 3
+
+# Final names match what create_tables.py produces for the partitioned model
+INDEX_RENAMES = [
+    ("posts_pkey", f"{LEGACY_TABLE}_pkey", f"{NEW_TABLE}_pkey"),
+    ("_channel_message_uc", "_channel_message_uc_legacy", "_channel_message_uc_partitioned"),
+    ("ix_posts_id", f"ix_{LEGACY_TABLE}_id", f"ix_{NEW_TABLE}_id"),
+    ("ix_posts_grouped_id", f"ix_{LEGACY_TABLE}_grouped_id", f"ix_{NEW_TABLE}_grouped_id"),
+    ("ix_posts_post_date_desc", f"ix_{LEGACY_TABLE}_post_date_desc", f"ix_{NEW_TABLE}_post_date_desc"),
+    ("ix_posts_channel_id_post_date", f"ix_{LEGACY_TABLE}_channel_id_post_date", f"ix_{NEW_TABLE}_channel_id_post_date"),
+]
+
+def create_partitioned_table(conn):
+    conn.execute(text(f"CREATE TABLE {NEW_TABLE} (LIKE posts INCLUDING DEFAULTS) PARTITION BY RANGE (post_date)"))
+    conn.execute(text(f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {NEW_TABLE}_pkey PRIMARY KEY (id, post_date)"))
+    conn.execute(text(
+        f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT _channel_message_uc_partitioned "
+        f"UNIQUE (channel_id, message_id, post_date)"
+    ))
+    conn.execute(text(f"CREATE INDEX ix_{NEW_TABLE}_id ON {NEW_TABLE} (id)"))
+    conn.execute(text(f"CREATE INDEX ix_{NEW_TABLE}_grouped_id ON {NEW_TABLE} (grouped_id)"))
+    conn.execute(text(f"CREATE INDEX ix_{NEW_TABLE}_post_date_desc ON {NEW_TABLE} (post_date DESC)"))
+    conn.execute(text(f"CREATE INDEX ix_{NEW_TABLE}_channel_id_post_date ON {NEW_TABLE} (channel_id, post_date)"))
+
+def create_month_partitions(conn):
+    """
+    Creates months up to PARTITIONS_AHEAD_MONTHS from now, starting after the last existing
+    partition. Only the first run scans the old table for min(post_date), never run it under the swap lock
+    """
+    existing = partitions.list_partitions(conn, NEW_TABLE)
+    if existing:
+        month = partitions.add_months(existing[-1][1], 1)
+    else:
+        oldest = conn.execute(text("SELECT min(post_date) FROM posts")).scalar() or datetime.now(timezone.utc)
+        month = partitions.month_start(oldest)
+    last = partitions.add_months(partitions.month_start(datetime.now(timezone.utc)), config.PARTITIONS_AHEAD_MONTHS)
+    while month <= last:
+        partitions.create_partition(conn, month, parent=NEW_TABLE)
+        month = partitions.add_months(month, 1)
+
+def copy_batch(conn, last_id: int, batch_size: int):
+    upper_id = conn.execute(text(
+        "SELECT max(id) FROM (SELECT id FROM posts WHERE id > :last_id ORDER BY id LIMIT :batch_size) AS batch"
+    ), {"last_id": last_id, "batch_size": batch_size}).scalar()
+    if upper_id is None:
+        return None, 0
+    result = conn.execute(text(
+        f"INSERT INTO {NEW_TABLE} SELECT * FROM posts WHERE id > :last_id AND id <= :upper_id ON CONFLICT DO NOTHING"
+    ), {"last_id": last_id, "upper_id": upper_id})
+    return upper_id, result.rowcount
+
+def copy_rows(batch_size: int) -> tuple:
+    """
+    Copies posts in id-ordered batches, one transaction per batch.
+    Progress is the max id already in the new table, so the copy can be resumed.
+    Returns (max id of posts before this copy started, last copied id)
+    """
+    with db.engine.begin() as conn:
+        last_id = conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {NEW_TABLE}")).scalar()
+        start_id = conn.execute(text("SELECT coalesce(max(id), 0) FROM posts")).scalar()
+    if last_id:
+        logger.info(f"Resuming copy after id {last_id}...")
+
+    copied = 0
+    while True:
+        with db.engine.begin() as conn:
+            upper_id, inserted = copy_batch(conn, last_id, batch_size)
+        if upper_id is None:
+            break
+        last_id = upper_id
+        copied += inserted
+        logger.info(f"Copied {copied} posts (up to id {last_id})...")
+    return start_id, last_id
+
+def stats_sync_from_id():
+    """
+    Lowest id among posts of the last STATS_SYNC_DAYS, looked up in the new table
+    (indexed on post_date) so the swap can re-sync stats by id range only
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=STATS_SYNC_DAYS)
+    with db.engine.connect() as conn:
+        return conn.execute(
+            text(f"SELECT min(id) FROM {NEW_TABLE} WHERE post_date >= :since"), {"since": since}
+        ).scalar()
+
+def swap_tables(copy_floor: int, copied_up_to: int, sync_from_id):
+    """
+    Short exclusive lock on posts: copies rows written during the copy,
+    re-syncs fresh stats and swaps the tables by renaming.
+    Ids are taken from the sequence before commit, so a row with an id below an already
+    copied batch can commit late: everything above copy_floor is copied again, duplicates
+    are skipped by ON CONFLICT. Every statement uses the id index of the old table
+    """
+    with db.engine.begin() as conn:
+        conn.execute(text("SET LOCAL lock_timeout = '10s'"))
+        conn.execute(text("LOCK TABLE posts IN ACCESS EXCLUSIVE MODE"))
+
+        result = conn.execute(text(
+            f"INSERT INTO {NEW_TABLE} SELECT * FROM posts WHERE id > :floor ON CONFLICT DO NOTHING"
+        ), {"floor": copy_floor})
+        logger.info(f"Copied {result.rowcount} posts written during the copy")
+
+        if sync_from_id is not None:
+            conn.execute(text(
+                f"UPDATE {NEW_TABLE} AS p SET views = o.views, reactions_count = o.reactions_count "
+                f"FROM posts AS o WHERE o.id = p.id AND o.post_date = p.post_date "
+                f"AND o.id BETWEEN :from_id AND :to_id AND p.id BETWEEN :from_id AND :to_id"
+            ), {"from_id": sync_from_id, "to_id": copied_up_to})
+
+        conn.execute(text(f"ALTER TABLE posts RENAME TO {LEGACY_TABLE}"))
+        for final_name, legacy_name, _ in INDEX_RENAMES:
+            conn.execute(text(f"ALTER INDEX IF EXISTS {final_name} RENAME TO {legacy_name}"))
+        conn.execute(text(f"ALTER TABLE {NEW_TABLE} RENAME TO posts"))
+        for final_name, _, new_name in INDEX_RENAMES:
+            conn.execute(text(f"ALTER INDEX IF EXISTS {new_name} RENAME TO {final_name}"))
+        conn.execute(text("ALTER SEQUENCE IF EXISTS posts_id_seq OWNED BY posts.id"))
+
+def main(batch_size: int, copy_only: bool):
+    if not db.engine:
+        logger.error("No db connection...")
+        return
+
+    with db.engine.begin() as conn:
+        if partitions.relkind(conn, "posts") == "p":
+            logger.info("Table posts is already partitioned")
+            return
+        if partitions.relkind(conn, NEW_TABLE) is None:
+            logger.info(f"Creating {NEW_TABLE}...")
+            create_partitioned_table(conn)
+        create_month_partitions(conn)
+
+    start_id, last_id = copy_rows(batch_size)
+    if copy_only:
+        logger.info("Copy finished, run again without --copy-only to swap tables")
+        return
+
+    sync_from_id = stats_sync_from_id()
+    # Rows still uncommitted when the copy started have ids below start_id; sync_from_id
+    # (first post of the last STATS_SYNC_DAYS) also covers those of earlier --copy-only runs
+    copy_floor = min(start_id, sync_from_id - 1) if sync_from_id is not None else start_id
+    logger.info("Swapping tables...")
+    swap_tables(copy_floor, last_id, sync_from_id)
+    logger.info(f"Finished. Old data kept in {LEGACY_TABLE}, drop it after checking: DROP TABLE {LEGACY_TABLE};")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move posts into monthly partitions on post_date without downtime")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows copied per transaction")
+    parser.add_argument("--copy-only", action="store_true", help="Only copy rows, dont swap tables yet")
+    args = parser.parse_args()
+    main(args.batch_size, args.copy_only)